@@ -1,23 +1,67 @@
+from dataclasses import dataclass
+
 import streamlit as st
 import pandas as pd
 import numpy as np
 import plotly.graph_objects as go
 
-def main():
-    st.set_page_config(page_title="Battery Revenue Simulator", layout="wide")
-
-    # Add Veolia logo
-    st.image("https://www.flexcity.energy/sites/g/files/dvc3216/files/Logo-Flexcity-by-Veolia---480x128.jpg", width=200)
-
-    st.title("Estimate Your Battery Revenue with Flexcity in Belgium")
-
-    st.markdown("""
-    Welcome to Flexcity's Battery Revenue Simulator. Discover how much revenue your battery can generate
-    by participating in the Belgian aFRR (Automatic Frequency Restoration Reserve) market with Flexcity.
-
-    This tool allows you to explore different market scenarios and see how partnering with Flexcity can maximize your investment.
-    """)
-
+HOURS_PER_MONTH = 24 * 365 / 12
+
+# Passed to st.image as a URL: the browser fetches and caches it, the script never downloads it
+LOGO_URL = "https://www.flexcity.energy/sites/g/files/dvc3216/files/Logo-Flexcity-by-Veolia---480x128.jpg"
+
+COLUMNS = (
+    'Month',
+    'Electricity Price (€/MWh)',
+    'aFRR Capacity Price (€/MW/h)',
+    'aFRR Activation Price (€/MWh)',
+    'Monthly Capacity Revenue (€)',
+    'Monthly Activation Revenue (€)',
+    'Monthly Charging Cost (€)',
+    'Net Monthly Revenue (€)',
+    'Cumulative Cash Flow (€)'
+)
+
+# Number formatting for the projections table
+_COLUMN_CONFIG = {col: st.column_config.NumberColumn(format='%,.2f') for col in COLUMNS[1:]}
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def _price_trajectories(initials, annual_growth_pcts, n_months):
+    # Monthly price paths compounding the annual growth rates, one row per price series
+    monthly_factors = (1 + np.asarray(annual_growth_pcts, dtype=np.float64) / 100) ** (1/12)
+    factors = np.repeat(monthly_factors[:, None], n_months, axis=1)
+    factors[:, 0] = initials
+    return np.cumprod(factors, axis=1, out=factors)
+
+def _payback_month(cumulative_cash_flow, net_monthly_revenues, total_investment):
+    paid_back = cumulative_cash_flow >= 0
+    if not paid_back.any():
+        return None
+    i = int(paid_back.argmax())
+    if i == 0:
+        # Payback in first month; nothing to recover with a zero investment cost
+        return int(total_investment / net_monthly_revenues[0]) if total_investment > 0 else 0
+    # Interpolate between months
+    return int(i - cumulative_cash_flow[i-1] / net_monthly_revenues[i])
+
+@dataclass(frozen=True)
+class Params:
+    capacity: float
+    power: float
+    efficiency: int
+    reserved_capacity_pct: int
+    availability: int
+    activation_rate: int
+    operational_life_years: int
+    battery_cost: float
+    initial_electricity_cost: float
+    electricity_price_growth_annual: float
+    initial_afrr_capacity_price: float
+    afrr_capacity_price_growth_annual: float
+    afrr_activation_price: float
+    afrr_activation_price_growth_annual: float
+
+def read_inputs():
     # Battery Specifications
     st.header("Battery Specifications")
     capacity = st.number_input("Battery Capacity (MWh)", min_value=0.1, value=2.0)
@@ -31,7 +75,6 @@ def main():
     activation_rate = st.slider("Average aFRR Activation Rate (%)", min_value=0, max_value=20, value=15)
     # Limit operational life to a maximum of 5 years
     operational_life_years = st.number_input("Battery Operational Life (years, max 5)", min_value=1, max_value=5, value=5)
-    operational_life_months = operational_life_years * 12
 
     # Financial Parameters
     st.header("Financial Parameters")
@@ -41,93 +84,101 @@ def main():
     st.header("Market Scenario")
     st.write("Customize the market scenario by adjusting the parameters below.")
 
-    # User-defined scenario parameters
+    # User-defined scenario parameters. Growth rates below -100 % would compound a negative
+    # factor into NaN prices, so they are bounded there.
     initial_electricity_cost = st.number_input("Initial Electricity Cost (€/MWh)", min_value=0.0, value=50.0)
-    electricity_price_growth_annual = st.number_input("Annual Electricity Price Growth Rate (% per year)", value=2.0)
+    electricity_price_growth_annual = st.number_input("Annual Electricity Price Growth Rate (% per year)", min_value=-100.0, value=2.0)
     initial_afrr_capacity_price = st.number_input("aFRR Capacity Price (€/MW/h)", min_value=0.0, value=80.0)
-    afrr_capacity_price_growth_annual = st.number_input("Annual aFRR Capacity Price Growth Rate (% per year)", value=2.0)
+    afrr_capacity_price_growth_annual = st.number_input("Annual aFRR Capacity Price Growth Rate (% per year)", min_value=-100.0, value=2.0)
     afrr_activation_price = st.number_input("aFRR Activation Price (€/MWh)", min_value=0.0, value=110.0)
-    afrr_activation_price_growth_annual = st.number_input("Annual aFRR Activation Price Growth Rate (% per year)", value=2.5)
+    afrr_activation_price_growth_annual = st.number_input("Annual aFRR Activation Price Growth Rate (% per year)", min_value=-100.0, value=2.5)
 
-    scenario = "Base Case"
-
-    # Convert annual growth rates to monthly growth rates
-    electricity_price_growth_monthly = (1 + electricity_price_growth_annual / 100) ** (1/12) - 1
-    afrr_capacity_price_growth_monthly = (1 + afrr_capacity_price_growth_annual / 100) ** (1/12) - 1
-    afrr_activation_price_growth_monthly = (1 + afrr_activation_price_growth_annual / 100) ** (1/12) - 1
+    return Params(
+        capacity, power, efficiency, reserved_capacity_pct, availability, activation_rate,
+        operational_life_years, battery_cost,
+        initial_electricity_cost, electricity_price_growth_annual,
+        initial_afrr_capacity_price, afrr_capacity_price_growth_annual,
+        afrr_activation_price, afrr_activation_price_growth_annual)
 
+@st.cache_data(show_spinner=False, max_entries=32)
+def compute(p):
     # Calculations
-    usable_capacity = capacity * (1 - reserved_capacity_pct / 100)
-    effective_power = min(power, usable_capacity * (efficiency / 100)) * (availability / 100)
-    total_investment = capacity * battery_cost
+    eff_frac = p.efficiency / 100
+    avail_frac = p.availability / 100
+    act_frac = p.activation_rate / 100
+    reserved_frac = p.reserved_capacity_pct / 100
+
+    usable_capacity = p.capacity * (1 - reserved_frac)
+    effective_power = min(p.power, usable_capacity * eff_frac) * avail_frac
+    total_investment = p.capacity * p.battery_cost
 
     # Prepare monthly periods
-    total_months = int(operational_life_months)
+    total_months = int(p.operational_life_years * 12)
     months = np.arange(1, total_months + 1)
 
     # Generate price trajectories on a monthly basis
-    electricity_prices = initial_electricity_cost * ((1 + electricity_price_growth_monthly) ** (months - 1))
-    afrr_capacity_prices = initial_afrr_capacity_price * ((1 + afrr_capacity_price_growth_monthly) ** (months - 1))
-    afrr_activation_prices = afrr_activation_price * ((1 + afrr_activation_price_growth_monthly) ** (months - 1))
-
-    # Monthly calculations
-    hours_per_month = 24 * 365 / 12
-    monthly_capacity_revenues = effective_power * afrr_capacity_prices * hours_per_month
-    monthly_energy_activated = effective_power * (activation_rate / 100) * hours_per_month
-    monthly_activation_revenues = monthly_energy_activated * afrr_activation_prices
-    monthly_revenues = monthly_capacity_revenues + monthly_activation_revenues
-    monthly_energy_charged = monthly_energy_activated / (efficiency / 100)
-    monthly_charging_costs = monthly_energy_charged * electricity_prices
-    net_monthly_revenues = monthly_revenues - monthly_charging_costs
-    cumulative_cash_flow = net_monthly_revenues.cumsum() - total_investment
+    prices = _price_trajectories(
+        (p.initial_electricity_cost, p.initial_afrr_capacity_price, p.afrr_activation_price),
+        (p.electricity_price_growth_annual, p.afrr_capacity_price_growth_annual, p.afrr_activation_price_growth_annual),
+        total_months)
+    electricity_prices, afrr_capacity_prices, afrr_activation_prices = prices
+
+    # Monthly calculations: each price row is scaled by the monthly volume it applies to
+    # (energy recharged, power offered, energy activated) in a single broadcast
+    base = effective_power * HOURS_PER_MONTH
+    monthly_energy_activated = base * act_frac
+    monthly_energy_charged = monthly_energy_activated / eff_frac
+    volumes = np.array([monthly_energy_charged, base, monthly_energy_activated])
+    monthly_charging_costs, monthly_capacity_revenues, monthly_activation_revenues = prices * volumes[:, None]
+    # Net revenue and cumulative cash flow
+    net_monthly_revenues = np.add(monthly_capacity_revenues, monthly_activation_revenues)
+    net_monthly_revenues -= monthly_charging_costs
+    cumulative_cash_flow = np.cumsum(net_monthly_revenues)
+    cumulative_cash_flow -= total_investment
 
     # Estimate payback period in months
-    payback_period = None
-    for i in range(len(cumulative_cash_flow)):
-        if cumulative_cash_flow[i] >= 0:
-            if i == 0:
-                # Payback in first month
-                fraction = (total_investment) / net_monthly_revenues[0]
-                months_needed = int(fraction)
-                payback_period = months_needed
-            else:
-                # Interpolate between months
-                cash_flow_before = cumulative_cash_flow[i-1]
-                cash_flow_after = cumulative_cash_flow[i]
-                cash_needed = -cash_flow_before
-                cash_generated_in_month = net_monthly_revenues[i]
-                fraction = cash_needed / cash_generated_in_month
-                months_needed = int(i + fraction)
-                payback_period = months_needed
-            break
-
-    df = pd.DataFrame({
-        'Month': months,
-        'Electricity Price (€/MWh)': electricity_prices,
-        'aFRR Capacity Price (€/MW/h)': afrr_capacity_prices,
-        'aFRR Activation Price (€/MWh)': afrr_activation_prices,
-        'Monthly Capacity Revenue (€)': monthly_capacity_revenues,
-        'Monthly Activation Revenue (€)': monthly_activation_revenues,
-        'Monthly Charging Cost (€)': monthly_charging_costs,
-        'Net Monthly Revenue (€)': net_monthly_revenues,
-        'Cumulative Cash Flow (€)': cumulative_cash_flow
-    })
+    payback_period = _payback_month(cumulative_cash_flow, net_monthly_revenues, total_investment)
+
+    # Projections table: money columns in one float block, plus the integer Month column
+    money_columns = (
+        electricity_prices, afrr_capacity_prices, afrr_activation_prices,
+        monthly_capacity_revenues, monthly_activation_revenues, monthly_charging_costs,
+        net_monthly_revenues, cumulative_cash_flow
+    )
+    table = np.empty((total_months, len(money_columns)), dtype=np.float64, order='F')
+    for j, column in enumerate(money_columns):
+        table[:, j] = column
+    df = pd.DataFrame(table, columns=COLUMNS[1:], copy=False)
+    df.insert(0, COLUMNS[0], months)
+
+    return df, cumulative_cash_flow, payback_period
+
+# Figures are mutable, so they are shared as a resource; st.plotly_chart only reads them
+@st.cache_resource(show_spinner=False, max_entries=32)
+def build_cash_flow_figure(params, scenario):
+    df, cumulative_cash_flow, _ = compute(params)
+    fig = go.Figure(
+        data=[go.Scatter(
+            x=df['Month'].to_numpy(),
+            y=cumulative_cash_flow,
+            mode='lines+markers',
+            name=scenario
+        )],
+        layout=dict(title='Cumulative Cash Flow Over Time',
+                    xaxis_title='Month',
+                    yaxis_title='Cumulative Cash Flow (€)',
+                    # Keep the user's zoom and pan when a rerun sends new data
+                    uirevision='cash_flow')
+    )
+    return fig
+
+def render_results(params, scenario):
+    df, _, payback_period = compute(params)
 
     # Display results
     st.header("Results")
     st.subheader("Cumulative Cash Flow")
-    fig = go.Figure()
-
-    fig.add_trace(go.Scatter(
-        x=df['Month'],
-        y=df['Cumulative Cash Flow (€)'],
-        mode='lines+markers',
-        name=scenario
-    ))
-
-    fig.update_layout(title='Cumulative Cash Flow Over Time',
-                      xaxis_title='Month',
-                      yaxis_title='Cumulative Cash Flow (€)')
+    fig = build_cash_flow_figure(params, scenario)
     st.plotly_chart(fig, use_container_width=True)
 
     st.subheader("Payback Period")
@@ -137,12 +188,29 @@ def main():
         st.write("**Estimated Payback Period:** Not within operational life")
 
     st.subheader("Detailed Financial Projections")
-    # Remove the index and ensure 'Month' is the first column
-    df.reset_index(drop=True, inplace=True)
-    df = df[['Month', 'Electricity Price (€/MWh)', 'aFRR Capacity Price (€/MW/h)', 'aFRR Activation Price (€/MWh)',
-             'Monthly Capacity Revenue (€)', 'Monthly Activation Revenue (€)', 'Monthly Charging Cost (€)',
-             'Net Monthly Revenue (€)', 'Cumulative Cash Flow (€)']]
-    st.dataframe(df.style.format('{:,.2f}'))
+    st.dataframe(df, column_config=_COLUMN_CONFIG, hide_index=True)
+
+def main():
+    st.set_page_config(page_title="Battery Revenue Simulator", layout="wide")
+
+    # Add Veolia logo
+    st.image(LOGO_URL, width=200)
+
+    st.title("Estimate Your Battery Revenue with Flexcity in Belgium")
+
+    st.markdown("""
+    Welcome to Flexcity's Battery Revenue Simulator. Discover how much revenue your battery can generate
+    by participating in the Belgian aFRR (Automatic Frequency Restoration Reserve) market with Flexcity.
+
+    This tool allows you to explore different market scenarios and see how partnering with Flexcity can maximize your investment.
+    """)
+
+    # Widgets inside the form only trigger a rerun when the user submits them
+    with st.form("battery_params"):
+        params = read_inputs()
+        st.form_submit_button("Simulate")
+
+    render_results(params, scenario="Base Case")
 
     st.markdown("""
     ### Understanding the Business Case